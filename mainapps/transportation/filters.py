@@ -3,14 +3,30 @@ Transportation Microservice Filters
 """
 
 import django_filters
-from .models import TransportationProvider, Schedule, TransportationBooking
+from django_filters.rest_framework import DjangoFilterBackend
+from .models import (
+    TransportationProvider, Schedule, TransportationBooking,
+    TransportationType, BookingStatus
+)
+
+
+class QueryParamFilterBackend(DjangoFilterBackend):
+    """Skip building the FilterSet when none of its filters are requested"""
+    
+    def filter_queryset(self, request, queryset, view):
+        filterset_class = self.get_filterset_class(view, queryset)
+        if filterset_class is not None and not any(
+            name in request.query_params for name in filterset_class.base_filters
+        ):
+            return queryset
+        return super().filter_queryset(request, queryset, view)
 
 
 class TransportationProviderFilter(django_filters.FilterSet):
     """Filter for transportation providers"""
     
     transportation_type = django_filters.ChoiceFilter(
-        choices=TransportationProvider.TransportationType.choices
+        choices=TransportationType.choices
     )
     city = django_filters.CharFilter(field_name='headquarters_city', lookup_expr='icontains')
     min_rating = django_filters.NumberFilter(field_name='average_rating', lookup_expr='gte')
@@ -43,7 +59,7 @@ class ScheduleFilter(django_filters.FilterSet):
 class TransportationBookingFilter(django_filters.FilterSet):
     """Filter for transportation bookings"""
     
-    status = django_filters.ChoiceFilter(choices=TransportationBooking.BookingStatus.choices)
+    status = django_filters.ChoiceFilter(choices=BookingStatus.choices)
     departure_date = django_filters.DateFilter(field_name='schedule__departure_date')
     departure_from = django_filters.DateFilter(field_name='schedule__departure_date', lookup_expr='gte')
     departure_to = django_filters.DateFilter(field_name='schedule__departure_date', lookup_expr='lte')
@@ -0,0 +1,24 @@
+"""
+Copy the route's provider onto schedules saved before it was denormalized
+onto Schedule. Safe to re-run.
+"""
+
+from django.core.management.base import BaseCommand
+from django.db.models import F, OuterRef, Subquery
+
+from mainapps.transportation.models import Route, Schedule
+
+
+class Command(BaseCommand):
+    help = "Backfill the route columns denormalized onto Schedule"
+    
+    def handle(self, *args, **options):
+        route = Route.objects.filter(pk=OuterRef('route_id'))
+        
+        updated = Schedule.objects.exclude(
+            provider=F('route__provider')
+        ).update(
+            provider=Subquery(route.values('provider_id')[:1])
+        )
+        
+        self.stdout.write(self.style.SUCCESS(f"Backfilled {updated} schedules"))
@@ -3,6 +3,8 @@ Transportation Microservice Models
 Handles flights, buses, trains, car rentals, and ride-hailing bookings
 """
 
+import secrets
+import string
 import uuid
 from django.db import models
 from django.core.validators import MinValueValidator, MaxValueValidator
@@ -93,12 +95,18 @@ class TransportationManager(models.Manager):
         return self.get_queryset().filter(is_active=True)
     
     def available_for_route(self, origin, destination, date):
+        # Correlated EXISTS lets the planner stop at the first matching route
         return self.get_queryset().filter(
-            routes__origin_city=origin,
-            routes__destination_city=destination,
-            schedules__departure_date=date,
+            models.Exists(
+                Route.objects.filter(
+                    provider=models.OuterRef('pk'),
+                    origin_city=origin,
+                    destination_city=destination,
+                    schedules__departure_date=date
+                )
+            ),
             is_active=True
-        ).distinct()
+        )
 
 
 class ProfileMixin(models.Model):
@@ -140,6 +148,9 @@ class TransportationType(models.TextChoices):
     MOTORCYCLE = 'motorcycle', _('Motorcycle')
 
 
+_TRANSPORT_TYPE_LABELS = dict(TransportationType.choices)
+
+
 class TransportationStatus(models.TextChoices):
     ACTIVE = 'active', _('Active')
     INACTIVE = 'inactive', _('Inactive')
@@ -201,7 +212,8 @@ class TransportationProvider(ProfileMixin):
         ]
     
     def __str__(self):
-        return f"{self.name} ({self.get_transportation_type_display()})"
+        label = _TRANSPORT_TYPE_LABELS.get(self.transportation_type, self.transportation_type)
+        return f"{self.name} ({label})"
 
 
 class Vehicle(ProfileMixin):
@@ -288,11 +300,22 @@ class Route(ProfileMixin):
         ordering = ['origin_city', 'destination_city']
         indexes = [
             models.Index(fields=['provider', 'is_active']),
-            models.Index(fields=['origin_city', 'destination_city']),
+            models.Index(fields=['origin_city', 'destination_city', 'provider']),
         ]
     
     def __str__(self):
         return f"{self.origin_city} → {self.destination_city}"
+    
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        super().save(*args, **kwargs)
+        
+        # A new route has no schedules yet
+        if adding:
+            return
+        
+        # Keep the provider copy on this route's schedules in step
+        self.schedules.exclude(provider=self.provider_id).update(provider=self.provider_id)
 
 
 class Schedule(ProfileMixin):
@@ -310,6 +333,15 @@ class Schedule(ProfileMixin):
         related_name='schedules'
     )
     
+    # Denormalized from route so provider lookups don't need a JOIN
+    provider = models.ForeignKey(
+        TransportationProvider,
+        on_delete=models.CASCADE,
+        related_name='schedules',
+        null=True,
+        editable=False
+    )
+    
     # Schedule Information
     departure_date = models.DateField()
     departure_time = models.TimeField()
@@ -345,10 +377,20 @@ class Schedule(ProfileMixin):
         indexes = [
             models.Index(fields=['route', 'departure_date']),
             models.Index(fields=['departure_date', 'status']),
+            models.Index(fields=['status', 'departure_date', 'available_seats']),
         ]
     
     def __str__(self):
         return f"{self.route} - {self.departure_date} {self.departure_time}"
+    
+    def save(self, *args, **kwargs):
+        self.provider_id = self.route.provider_id
+        
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'route', 'route_id'}.intersection(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'provider'}
+        
+        super().save(*args, **kwargs)
 
 
 class BookingStatus(models.TextChoices):
@@ -361,6 +403,17 @@ class BookingStatus(models.TextChoices):
     NO_SHOW = 'no_show', _('No Show')
 
 
+# Booking reference suffixes: 8 chars over A-Z0-9, drawn from 6 random bytes
+# (2^48 is ~100x 36^8, so the modulo bias is negligible)
+_REFERENCE_ALPHABET = string.ascii_uppercase + string.digits
+_REFERENCE_LENGTH = 8
+_REFERENCE_BYTES = 6
+
+
+# Inputs to the subtotal/total computed in TransportationBooking.save
+_PRICING_FIELDS = frozenset(['unit_price', 'number_of_passengers', 'taxes', 'fees'])
+
+
 class TransportationBooking(ProfileMixin):
     """Transportation booking records"""
     
@@ -428,7 +481,6 @@ class TransportationBooking(ProfileMixin):
             models.Index(fields=['profile_id', 'status']),
             models.Index(fields=['passenger_user_id']),
             models.Index(fields=['schedule']),
-            models.Index(fields=['booking_reference']),
         ]
     
     def __str__(self):
@@ -438,20 +490,51 @@ class TransportationBooking(ProfileMixin):
         if not self.booking_reference:
             self.booking_reference = self.generate_booking_reference()
         
-        # Calculate totals
-        self.subtotal = self.unit_price * self.number_of_passengers
-        self.total_amount = self.subtotal + self.taxes + self.fees
+        # Calculate totals, unless a partial save leaves pricing untouched
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or _PRICING_FIELDS.intersection(update_fields):
+            self.calculate_totals()
+            if update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | {'subtotal', 'total_amount'}
         
         super().save(*args, **kwargs)
     
-    def generate_booking_reference(self):
+    def calculate_totals(self):
+        self.subtotal = self.unit_price * self.number_of_passengers
+        self.total_amount = self.subtotal + self.taxes + self.fees
+    
+    def generate_booking_reference(self, random_bytes=None):
         """Generate unique booking reference"""
-        import random
-        import string
-        
         prefix = "TRP"
-        suffix = ''.join(random.choices(string.ascii_uppercase + string.digits, k=8))
+        if random_bytes is None:
+            random_bytes = secrets.token_bytes(_REFERENCE_BYTES)
+        
+        # Render in base 36 to keep the full 36^8 space of the original
+        # random.choices suffix
+        value = int.from_bytes(random_bytes, 'big') % len(_REFERENCE_ALPHABET) ** _REFERENCE_LENGTH
+        chars = []
+        for _ in range(_REFERENCE_LENGTH):
+            value, index = divmod(value, len(_REFERENCE_ALPHABET))
+            chars.append(_REFERENCE_ALPHABET[index])
+        suffix = ''.join(chars)
         return f"{prefix}-{self.profile_id}-{suffix}"
+    
+    @classmethod
+    def bulk_create_with_refs(cls, bookings, **kwargs):
+        """
+        Insert bookings in one query. bulk_create bypasses save(), so
+        references and totals are filled in here, drawing the randomness
+        for every reference from a single token_bytes call.
+        """
+        bookings = list(bookings)
+        random_bytes = secrets.token_bytes(_REFERENCE_BYTES * len(bookings))
+        for i, booking in enumerate(bookings):
+            if not booking.booking_reference:
+                booking.booking_reference = booking.generate_booking_reference(
+                    random_bytes[i * _REFERENCE_BYTES:(i + 1) * _REFERENCE_BYTES]
+                )
+            booking.calculate_totals()
+        return cls.objects.bulk_create(bookings, **kwargs)
 
 
 class PassengerDetail(models.Model):
@@ -6,10 +6,31 @@ from rest_framework import serializers
 from django.db import transaction
 from .models import (
     TransportationProvider, Vehicle, Route, Schedule,
-    TransportationBooking, PassengerDetail, TransportationReview
+    TransportationBooking, PassengerDetail, TransportationReview,
+    BookingStatus
 )
 
 
+class SerializerCacheMixin:
+    """
+    Reuse the representation of an instance already rendered by the same
+    serializer class within one top-level serialization, e.g. a schedule
+    shared by many bookings in a list.
+    """
+    
+    def to_representation(self, instance):
+        # .data after is_valid() without save() passes validated_data, a dict
+        pk = getattr(instance, 'pk', None)
+        if pk is None:
+            return super().to_representation(instance)
+        
+        cache = self.root.__dict__.setdefault('_representation_cache', {})
+        key = (self.__class__, pk)
+        if key not in cache:
+            cache[key] = super().to_representation(instance)
+        return cache[key]
+
+
 class VehicleSerializer(serializers.ModelSerializer):
     """Serializer for vehicles"""
     
@@ -22,10 +43,10 @@ class VehicleSerializer(serializers.ModelSerializer):
         ]
 
 
-class RouteSerializer(serializers.ModelSerializer):
+class RouteSerializer(SerializerCacheMixin, serializers.ModelSerializer):
     """Serializer for routes"""
     
-    provider_name = serializers.CharField(source='provider.name', read_only=True)
+    provider_name = serializers.SerializerMethodField()
     
     class Meta:
         model = Route
@@ -36,9 +57,17 @@ class RouteSerializer(serializers.ModelSerializer):
             'destination_address', 'distance_km', 'estimated_duration',
             'base_price', 'currency', 'is_active'
         ]
+    
+    def get_provider_name(self, obj):
+        # Annotated by RouteViewSet's read actions; writes and nested routes
+        # fall back to the relation
+        provider_name = getattr(obj, 'provider_name', None)
+        if provider_name is None:
+            provider_name = obj.provider.name
+        return provider_name
 
 
-class ScheduleSerializer(serializers.ModelSerializer):
+class ScheduleSerializer(SerializerCacheMixin, serializers.ModelSerializer):
     """Serializer for schedules"""
     
     route_info = RouteSerializer(source='route', read_only=True)
@@ -53,11 +82,27 @@ class ScheduleSerializer(serializers.ModelSerializer):
         ]
 
 
-class TransportationProviderListSerializer(serializers.ModelSerializer):
+class ScheduleListSerializer(serializers.Serializer):
+    """Flat serializer for schedule listings, fed by a values() queryset"""
+    
+    id = serializers.UUIDField(read_only=True)
+    route = serializers.UUIDField(read_only=True)
+    vehicle = serializers.UUIDField(read_only=True)
+    origin_city = serializers.CharField(source='route__origin_city', read_only=True)
+    destination_city = serializers.CharField(source='route__destination_city', read_only=True)
+    vehicle_name = serializers.CharField(source='vehicle__name', read_only=True)
+    departure_date = serializers.DateField(read_only=True)
+    departure_time = serializers.TimeField(read_only=True)
+    price = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
+    available_seats = serializers.IntegerField(read_only=True)
+    status = serializers.CharField(read_only=True)
+
+
+class TransportationProviderListSerializer(SerializerCacheMixin, serializers.ModelSerializer):
     """Lightweight serializer for provider listings"""
     
-    routes_count = serializers.SerializerMethodField()
-    vehicles_count = serializers.SerializerMethodField()
+    routes_count = serializers.IntegerField(read_only=True)
+    vehicles_count = serializers.IntegerField(read_only=True)
     
     class Meta:
         model = TransportationProvider
@@ -66,12 +111,6 @@ class TransportationProviderListSerializer(serializers.ModelSerializer):
             'headquarters_state', 'average_rating', 'total_reviews',
             'is_verified', 'routes_count', 'vehicles_count'
         ]
-    
-    def get_routes_count(self, obj):
-        return obj.routes.filter(is_active=True).count()
-    
-    def get_vehicles_count(self, obj):
-        return obj.vehicles.filter(is_active=True).count()
 
 
 class TransportationProviderDetailSerializer(serializers.ModelSerializer):
@@ -94,8 +133,12 @@ class TransportationProviderDetailSerializer(serializers.ModelSerializer):
         read_only_fields = ['created_at', 'updated_at', 'average_rating', 'total_reviews']
     
     def get_recent_reviews(self, obj):
-        recent_reviews = obj.reviews.filter(is_published=True)[:3]
-        return TransportationReviewSerializer(recent_reviews, many=True, context=self.context).data
+        # Populated by the viewset's Prefetch; fall back to a query for
+        # instances that weren't loaded through it (e.g. after create)
+        recent_reviews = getattr(obj, 'recent_reviews_cache', None)
+        if recent_reviews is None:
+            recent_reviews = obj.reviews.filter(is_published=True).order_by('-created_at')
+        return TransportationReviewSerializer(recent_reviews[:3], many=True, context=self.context).data
 
 
 class PassengerDetailSerializer(serializers.ModelSerializer):
@@ -109,11 +152,12 @@ class PassengerDetailSerializer(serializers.ModelSerializer):
         ]
 
 
-class TransportationBookingSerializer(serializers.ModelSerializer):
+class TransportationBookingSerializer(SerializerCacheMixin, serializers.ModelSerializer):
     """Serializer for transportation bookings"""
     
     schedule_info = ScheduleSerializer(source='schedule', read_only=True)
     passengers = PassengerDetailSerializer(many=True, required=False)
+    status = serializers.ChoiceField(choices=BookingStatus.choices, required=False)
     
     class Meta:
         model = TransportationBooking
@@ -142,7 +186,7 @@ class TransportationBookingSerializer(serializers.ModelSerializer):
         return booking
 
 
-class TransportationReviewSerializer(serializers.ModelSerializer):
+class TransportationReviewSerializer(SerializerCacheMixin, serializers.ModelSerializer):
     """Serializer for transportation reviews"""
     
     provider_name = serializers.CharField(source='provider.name', read_only=True)
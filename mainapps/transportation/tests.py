@@ -1,3 +1,231 @@
+import datetime
+from io import StringIO
+from decimal import Decimal
+
+from django.core.management import call_command
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from .models import (
+    TransportationProvider, Vehicle, Route, Schedule, TransportationBooking
+)
+from .serializers import ScheduleSerializer
+
+
+class TransportationTestCase(TestCase):
+    """Shared provider/route/vehicle fixtures"""
+    
+    def setUp(self):
+        self.provider = TransportationProvider.objects.create(
+            profile_id='profile-1',
+            name='Prov',
+            slug='prov',
+            transportation_type='bus',
+            headquarters_city='Uyo',
+            headquarters_state='Akwa Ibom'
+        )
+        self.route = Route.objects.create(
+            profile_id='profile-1',
+            provider=self.provider,
+            name='Uyo - Lagos',
+            origin_city='Uyo',
+            origin_state='Akwa Ibom',
+            destination_city='Lagos',
+            destination_state='Lagos',
+            estimated_duration=datetime.timedelta(hours=10),
+            base_price=Decimal('15000.00')
+        )
+        self.vehicle = Vehicle.objects.create(
+            profile_id='profile-1',
+            provider=self.provider,
+            name='Coach 1',
+            vehicle_number='AKW-001',
+            vehicle_type='bus',
+            total_seats=40,
+            available_seats=40
+        )
+    
+    def create_schedule(self, route=None, departure_date=None, departure_time=None):
+        return Schedule.objects.create(
+            profile_id='profile-1',
+            route=route or self.route,
+            vehicle=self.vehicle,
+            departure_date=departure_date or datetime.date(2026, 1, 1),
+            departure_time=departure_time or datetime.time(8, 0),
+            arrival_time=datetime.time(18, 0),
+            price=Decimal('15000.00'),
+            available_seats=40
+        )
+
+
+class ScheduleDenormalizationTests(TransportationTestCase):
+    """Route data copied onto Schedule stays in step with the route"""
+    
+    def test_save_copies_route_provider(self):
+        schedule = self.create_schedule()
+        schedule.refresh_from_db()
+        
+        self.assertEqual(schedule.provider_id, self.provider.id)
+    
+    def test_route_save_propagates_provider(self):
+        schedule = self.create_schedule()
+        other_provider = TransportationProvider.objects.create(
+            profile_id='profile-1',
+            name='Other Prov',
+            slug='other-prov',
+            transportation_type='bus',
+            headquarters_city='Calabar',
+            headquarters_state='Cross River'
+        )
+        
+        self.route.provider = other_provider
+        self.route.save()
+        schedule.refresh_from_db()
+        
+        self.assertEqual(schedule.provider_id, other_provider.id)
+    
+    def test_save_with_route_in_update_fields_writes_provider(self):
+        schedule = self.create_schedule()
+        other_provider = TransportationProvider.objects.create(
+            profile_id='profile-1',
+            name='Other Prov',
+            slug='other-prov',
+            transportation_type='bus',
+            headquarters_city='Calabar',
+            headquarters_state='Cross River'
+        )
+        other_route = Route.objects.create(
+            profile_id='profile-1',
+            provider=other_provider,
+            name='Calabar - Abuja',
+            origin_city='Calabar',
+            origin_state='Cross River',
+            destination_city='Abuja',
+            destination_state='FCT',
+            estimated_duration=datetime.timedelta(hours=12),
+            base_price=Decimal('20000.00')
+        )
+        
+        schedule.route = other_route
+        schedule.save(update_fields=['route'])
+        schedule.refresh_from_db()
+        
+        self.assertEqual(schedule.route_id, other_route.id)
+        self.assertEqual(schedule.provider_id, other_provider.id)
+    
+    def test_backfill_command_fills_existing_schedules(self):
+        schedule = self.create_schedule()
+        Schedule.objects.filter(pk=schedule.pk).update(provider=None)
+        
+        call_command('backfill_schedule_routes', stdout=StringIO())
+        schedule.refresh_from_db()
+        
+        self.assertEqual(schedule.provider_id, self.provider.id)
+
+
+class TransportationBookingTests(TransportationTestCase):
+    """Booking references and computed totals"""
+    
+    def setUp(self):
+        super().setUp()
+        self.schedule = self.create_schedule()
+    
+    def build_booking(self, **kwargs):
+        fields = {
+            'profile_id': 'profile-1',
+            'schedule': self.schedule,
+            'passenger_user_id': 'user-1',
+            'passenger_name': 'Ada Obi',
+            'passenger_email': 'ada@example.com',
+            'passenger_phone': '08000000000',
+            'number_of_passengers': 2,
+            'unit_price': Decimal('15000.00'),
+            'taxes': Decimal('500.00'),
+            'fees': Decimal('250.00'),
+        }
+        fields.update(kwargs)
+        return TransportationBooking(**fields)
+    
+    def test_bulk_create_with_refs_sets_distinct_references(self):
+        bookings = TransportationBooking.bulk_create_with_refs(
+            [self.build_booking() for _ in range(20)]
+        )
+        
+        references = [booking.booking_reference for booking in bookings]
+        self.assertEqual(len(set(references)), 20)
+        for reference in references:
+            self.assertRegex(reference, r'^TRP-profile-1-[A-Z0-9]{8}$')
+        self.assertEqual(
+            TransportationBooking.objects.filter(booking_reference__in=references).count(),
+            20
+        )
+    
+    def test_bulk_create_with_refs_computes_totals(self):
+        TransportationBooking.bulk_create_with_refs([self.build_booking()])
+        booking = TransportationBooking.objects.get()
+        
+        self.assertEqual(booking.subtotal, Decimal('30000.00'))
+        self.assertEqual(booking.total_amount, Decimal('30750.00'))
+    
+    def test_bulk_create_with_refs_keeps_existing_reference(self):
+        TransportationBooking.bulk_create_with_refs(
+            [self.build_booking(booking_reference='TRP-profile-1-FIXED001')]
+        )
+        
+        self.assertTrue(
+            TransportationBooking.objects.filter(booking_reference='TRP-profile-1-FIXED001').exists()
+        )
+    
+    def test_partial_save_with_pricing_field_writes_totals(self):
+        booking = self.build_booking()
+        booking.save()
+        
+        booking.number_of_passengers = 3
+        booking.save(update_fields=['number_of_passengers'])
+        booking.refresh_from_db()
+        
+        self.assertEqual(booking.subtotal, Decimal('45000.00'))
+        self.assertEqual(booking.total_amount, Decimal('45750.00'))
+    
+    def test_partial_save_without_pricing_field_leaves_totals(self):
+        booking = self.build_booking()
+        booking.save()
+        # Make the stored totals stale so a recompute would be visible
+        TransportationBooking.objects.filter(pk=booking.pk).update(
+            subtotal=Decimal('1.00'), total_amount=Decimal('1.00')
+        )
+        booking.refresh_from_db()
+        
+        booking.status = 'confirmed'
+        booking.save(update_fields=['status'])
+        booking.refresh_from_db()
+        
+        self.assertEqual(booking.status, 'confirmed')
+        self.assertEqual(booking.subtotal, Decimal('1.00'))
+        self.assertEqual(booking.total_amount, Decimal('1.00'))
+
 
-# Create your tests here.
+class ScheduleAvailableTests(TransportationTestCase):
+    """Unpaginated available schedules are streamed"""
+    
+    def test_streamed_body_matches_json_renderer(self):
+        # Non-ASCII text checks that the stream doesn't escape it
+        Route.objects.filter(pk=self.route.pk).update(name='Uyo → Lagos')
+        tomorrow = timezone.localdate() + datetime.timedelta(days=1)
+        self.create_schedule(departure_date=tomorrow, departure_time=datetime.time(8, 0))
+        self.create_schedule(departure_date=tomorrow, departure_time=datetime.time(14, 0))
+        
+        response = self.client.get(reverse('schedule-available'))
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        expected = JSONRenderer().render(
+            ScheduleSerializer(
+                Schedule.objects.select_related('route__provider', 'vehicle'),
+                many=True
+            ).data
+        )
+        self.assertEqual(b''.join(response.streaming_content), expected)
@@ -6,10 +6,15 @@ from rest_framework import viewsets, status, filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly
-from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Q, Count
+from rest_framework.utils.encoders import JSONEncoder
+from django.db.models import Q, F, Count, Exists, OuterRef, Prefetch, Window
+from django.db.models.functions import RowNumber
 from django.utils import timezone
-from datetime import datetime
+from django.http import StreamingHttpResponse
+from django.utils.functional import cached_property
+from itertools import islice
+import datetime
+import json
 
 from .models import (
     TransportationProvider, Vehicle, Route, Schedule,
@@ -17,35 +22,109 @@ from .models import (
 )
 from .serializers import (
     TransportationProviderListSerializer, TransportationProviderDetailSerializer,
-    VehicleSerializer, RouteSerializer, ScheduleSerializer,
+    VehicleSerializer, RouteSerializer, ScheduleSerializer, ScheduleListSerializer,
     TransportationBookingSerializer, TransportationReviewSerializer
 )
-from .filters import TransportationProviderFilter, ScheduleFilter, TransportationBookingFilter
+from .filters import (
+    QueryParamFilterBackend, TransportationProviderFilter, ScheduleFilter,
+    TransportationBookingFilter
+)
+
+
+def _parse_date(value):
+    """Parse a YYYY-MM-DD query parameter; raises ValueError if malformed"""
+    # fromisoformat also takes basic (20260101) and week (2026-W01-1) dates
+    # on Python 3.11+, so check the shape first
+    if len(value) != 10 or value[4] != '-' or value[7] != '-':
+        raise ValueError(f"Invalid date: {value!r}")
+    return datetime.date.fromisoformat(value)
+
 
+class ProfileContextMixin:
+    """Per-request cache of the caller's profile and user identifiers"""
+    
+    @cached_property
+    def profile_id(self):
+        return self.request.headers.get('X-Profile-ID')
+    
+    @cached_property
+    def user_id_str(self):
+        return str(self.request.user.id)
+    
+    def scope_to_owner(self, queryset):
+        """Restrict mutating actions to the caller's profile"""
+        # Check the action first so read-only requests never touch the
+        # user object or the profile header
+        if self.action not in ['create', 'update', 'partial_update', 'destroy']:
+            return queryset
+        if self.profile_id and self.request.user.is_authenticated:
+            return queryset.filter(profile_id=self.profile_id)
+        return queryset
+
+
+class FilterBackendCacheMixin:
+    """Instantiate the (stateless) filter backends once per viewset class"""
+    
+    def filter_queryset(self, queryset):
+        # Look in the class's own __dict__ so subclasses don't inherit a
+        # parent's backends
+        backends = type(self).__dict__.get('_filter_backend_instances')
+        if backends is None:
+            backends = [backend() for backend in self.filter_backends]
+            type(self)._filter_backend_instances = backends
+        
+        for backend in backends:
+            queryset = backend.filter_queryset(self.request, queryset, self)
+        return queryset
 
-class TransportationProviderViewSet(viewsets.ModelViewSet):
+
+class TransportationProviderViewSet(ProfileContextMixin, FilterBackendCacheMixin, viewsets.ModelViewSet):
     """ViewSet for transportation provider management"""
     
     permission_classes = [IsAuthenticatedOrReadOnly]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [QueryParamFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_class = TransportationProviderFilter
     search_fields = ['name', 'description', 'headquarters_city']
     ordering_fields = ['created_at', 'average_rating', 'name']
     ordering = ['-created_at']
     
     def get_queryset(self):
-        queryset = TransportationProvider.objects.prefetch_related(
-            'vehicles', 'routes'
-        )
+        queryset = TransportationProvider.objects.all()
         
-        if self.request.user.is_authenticated:
-            profile_id = self.request.headers.get('X-Profile-ID')
-            if profile_id and self.action in ['create', 'update', 'partial_update', 'destroy']:
-                queryset = queryset.filter(profile_id=profile_id)
+        queryset = self.scope_to_owner(queryset)
         
         if self.action in ['list', 'retrieve']:
             queryset = queryset.filter(is_active=True)
         
+        if self.action == 'list':
+            queryset = queryset.only(
+                'id', 'name', 'slug', 'transportation_type', 'headquarters_city',
+                'headquarters_state', 'average_rating', 'total_reviews', 'is_verified'
+            ).annotate(
+                routes_count=Count('routes', filter=Q(routes__is_active=True), distinct=True),
+                vehicles_count=Count('vehicles', filter=Q(vehicles__is_active=True), distinct=True)
+            )
+        elif self.action == 'retrieve':
+            queryset = queryset.prefetch_related(
+                'vehicles',
+                'routes',
+                Prefetch(
+                    'reviews',
+                    # Only the top three per provider are serialized, so rank
+                    # them in SQL rather than pulling every review
+                    queryset=TransportationReview.objects.filter(
+                        is_published=True
+                    ).annotate(
+                        row_number=Window(
+                            expression=RowNumber(),
+                            partition_by=[F('provider_id')],
+                            order_by=F('created_at').desc()
+                        )
+                    ).filter(row_number__lte=3).order_by('-created_at'),
+                    to_attr='recent_reviews_cache'
+                )
+            )
+        
         return queryset
     
     def get_serializer_class(self):
@@ -54,11 +133,9 @@ class TransportationProviderViewSet(viewsets.ModelViewSet):
         return TransportationProviderDetailSerializer
     
     def perform_create(self, serializer):
-        profile_id = self.request.headers.get('X-Profile-ID')
-        user_id = str(self.request.user.id)
         serializer.save(
-            profile_id=profile_id,
-            created_by_id=user_id
+            profile_id=self.profile_id,
+            created_by_id=self.user_id_str
         )
     
     @action(detail=True, methods=['get'])
@@ -66,6 +143,12 @@ class TransportationProviderViewSet(viewsets.ModelViewSet):
         """Get routes for a provider"""
         provider = self.get_object()
         routes = provider.routes.filter(is_active=True)
+        
+        page = self.paginate_queryset(routes)
+        if page is not None:
+            serializer = RouteSerializer(page, many=True, context={'request': request})
+            return self.get_paginated_response(serializer.data)
+        
         serializer = RouteSerializer(routes, many=True, context={'request': request})
         return Response(serializer.data)
     
@@ -76,13 +159,13 @@ class TransportationProviderViewSet(viewsets.ModelViewSet):
         date = request.query_params.get('date')
         
         schedules = Schedule.objects.filter(
-            route__provider=provider,
+            provider=provider,
             status='scheduled'
-        )
+        ).select_related('route__provider', 'vehicle')
         
         if date:
             try:
-                date_obj = datetime.strptime(date, '%Y-%m-%d').date()
+                date_obj = _parse_date(date)
                 schedules = schedules.filter(departure_date=date_obj)
             except ValueError:
                 return Response(
@@ -90,11 +173,16 @@ class TransportationProviderViewSet(viewsets.ModelViewSet):
                     status=status.HTTP_400_BAD_REQUEST
                 )
         
+        page = self.paginate_queryset(schedules)
+        if page is not None:
+            serializer = ScheduleSerializer(page, many=True, context={'request': request})
+            return self.get_paginated_response(serializer.data)
+        
         serializer = ScheduleSerializer(schedules, many=True, context={'request': request})
         return Response(serializer.data)
 
 
-class VehicleViewSet(viewsets.ModelViewSet):
+class VehicleViewSet(ProfileContextMixin, FilterBackendCacheMixin, viewsets.ModelViewSet):
     """ViewSet for vehicle management"""
     
     serializer_class = VehicleSerializer
@@ -104,19 +192,27 @@ class VehicleViewSet(viewsets.ModelViewSet):
     ordering = ['provider', 'name']
     
     def get_queryset(self):
-        profile_id = self.request.headers.get('X-Profile-ID')
-        return Vehicle.objects.filter(profile_id=profile_id).select_related('provider')
+        queryset = Vehicle.objects.filter(profile_id=self.profile_id)
+        
+        if self.action == 'list':
+            # VehicleSerializer never reads the provider, so skip the join
+            return queryset.only(
+                'id', 'provider', 'name', 'vehicle_number', 'vehicle_type', 'make',
+                'model', 'year', 'total_seats', 'available_seats', 'has_wifi',
+                'has_ac', 'has_entertainment', 'has_charging_ports', 'status',
+                'is_active'
+            )
+        
+        return queryset.select_related('provider')
     
     def perform_create(self, serializer):
-        profile_id = self.request.headers.get('X-Profile-ID')
-        user_id = str(self.request.user.id)
         serializer.save(
-            profile_id=profile_id,
-            created_by_id=user_id
+            profile_id=self.profile_id,
+            created_by_id=self.user_id_str
         )
 
 
-class RouteViewSet(viewsets.ModelViewSet):
+class RouteViewSet(ProfileContextMixin, FilterBackendCacheMixin, viewsets.ModelViewSet):
     """ViewSet for route management"""
     
     serializer_class = RouteSerializer
@@ -126,24 +222,33 @@ class RouteViewSet(viewsets.ModelViewSet):
     ordering = ['origin_city', 'destination_city']
     
     def get_queryset(self):
-        queryset = Route.objects.select_related('provider')
+        queryset = Route.objects.all()
         
-        if self.request.user.is_authenticated:
-            profile_id = self.request.headers.get('X-Profile-ID')
-            if profile_id and self.action in ['create', 'update', 'partial_update', 'destroy']:
-                queryset = queryset.filter(profile_id=profile_id)
+        queryset = self.scope_to_owner(queryset)
         
         if self.action in ['list', 'retrieve']:
             queryset = queryset.filter(is_active=True)
         
+        # Read-only actions only: after an update the annotation would still
+        # hold the previous provider's name
+        if self.action in ['list', 'retrieve', 'search_routes']:
+            queryset = queryset.annotate(provider_name=F('provider__name'))
+        
+        if self.action in ['list', 'search_routes']:
+            queryset = queryset.only(
+                'id', 'provider', 'name', 'route_code',
+                'origin_city', 'origin_state', 'origin_terminal', 'origin_address',
+                'destination_city', 'destination_state', 'destination_terminal',
+                'destination_address', 'distance_km', 'estimated_duration',
+                'base_price', 'currency', 'is_active'
+            )
+        
         return queryset
     
     def perform_create(self, serializer):
-        profile_id = self.request.headers.get('X-Profile-ID')
-        user_id = str(self.request.user.id)
         serializer.save(
-            profile_id=profile_id,
-            created_by_id=user_id
+            profile_id=self.profile_id,
+            created_by_id=self.user_id_str
         )
     
     @action(detail=False, methods=['get'])
@@ -167,11 +272,16 @@ class RouteViewSet(viewsets.ModelViewSet):
         if date:
             # Filter routes that have schedules on the specified date
             try:
-                date_obj = datetime.strptime(date, '%Y-%m-%d').date()
+                date_obj = _parse_date(date)
                 routes = routes.filter(
-                    schedules__departure_date=date_obj,
-                    schedules__status='scheduled'
-                ).distinct()
+                    Exists(
+                        Schedule.objects.filter(
+                            route=OuterRef('pk'),
+                            departure_date=date_obj,
+                            status='scheduled'
+                        )
+                    )
+                )
             except ValueError:
                 return Response(
                     {'error': 'Invalid date format. Use YYYY-MM-DD'},
@@ -182,40 +292,48 @@ class RouteViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 
-class ScheduleViewSet(viewsets.ModelViewSet):
+class ScheduleViewSet(ProfileContextMixin, FilterBackendCacheMixin, viewsets.ModelViewSet):
     """ViewSet for schedule management"""
     
     serializer_class = ScheduleSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
-    filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
+    filter_backends = [QueryParamFilterBackend, filters.OrderingFilter]
     filterset_class = ScheduleFilter
     ordering = ['departure_date', 'departure_time']
     
     def get_queryset(self):
-        queryset = Schedule.objects.select_related('route', 'vehicle')
+        queryset = Schedule.objects.select_related('route__provider', 'vehicle')
+        
+        queryset = self.scope_to_owner(queryset)
         
-        if self.request.user.is_authenticated:
-            profile_id = self.request.headers.get('X-Profile-ID')
-            if profile_id and self.action in ['create', 'update', 'partial_update', 'destroy']:
-                queryset = queryset.filter(profile_id=profile_id)
+        if self.action == 'list':
+            queryset = queryset.values(
+                'id', 'route', 'vehicle', 'route__origin_city',
+                'route__destination_city', 'vehicle__name', 'departure_date',
+                'departure_time', 'price', 'available_seats', 'status'
+            )
         
         return queryset
     
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return ScheduleListSerializer
+        return ScheduleSerializer
+    
     def perform_create(self, serializer):
-        profile_id = self.request.headers.get('X-Profile-ID')
-        user_id = str(self.request.user.id)
         serializer.save(
-            profile_id=profile_id,
-            created_by_id=user_id
+            profile_id=self.profile_id,
+            created_by_id=self.user_id_str
         )
     
     @action(detail=False, methods=['get'])
     def available(self, request):
         """Get available schedules for booking"""
+        today = timezone.localdate()
         queryset = self.get_queryset().filter(
             status='scheduled',
             available_seats__gt=0,
-            departure_date__gte=timezone.now().date()
+            departure_date__gte=today
         )
         
         page = self.paginate_queryset(queryset)
@@ -223,41 +341,57 @@ class ScheduleViewSet(viewsets.ModelViewSet):
             serializer = self.get_serializer(page, many=True)
             return self.get_paginated_response(serializer.data)
         
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+        # Unpaginated windows can be large, so stream them in chunks rather
+        # than materializing every schedule at once
+        return StreamingHttpResponse(
+            self._stream_json(queryset),
+            content_type='application/json'
+        )
+    
+    def _stream_json(self, queryset, chunk_size=1000):
+        """Yield the serialized queryset as a JSON array, chunk by chunk"""
+        rows = queryset.iterator(chunk_size=chunk_size)
+        separator = ''
+        yield '['
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                break
+            for item in self.get_serializer(chunk, many=True).data:
+                # Same compact, non-ASCII-escaped output as DRF's JSONRenderer
+                yield separator + json.dumps(
+                    item, cls=JSONEncoder, separators=(',', ':'), ensure_ascii=False
+                )
+                separator = ','
+        yield ']'
 
 
-class TransportationBookingViewSet(viewsets.ModelViewSet):
+class TransportationBookingViewSet(ProfileContextMixin, FilterBackendCacheMixin, viewsets.ModelViewSet):
     """ViewSet for transportation bookings"""
     
     serializer_class = TransportationBookingSerializer
     permission_classes = [IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
+    filter_backends = [QueryParamFilterBackend, filters.OrderingFilter]
     filterset_class = TransportationBookingFilter
     ordering = ['-booking_date']
     
     def get_queryset(self):
-        user_id = str(self.request.user.id)
-        profile_id = self.request.headers.get('X-Profile-ID')
-        
         queryset = TransportationBooking.objects.select_related(
-            'schedule__route', 'schedule__vehicle'
-        )
+            'schedule__route__provider', 'schedule__vehicle'
+        ).prefetch_related('passengers')
         
-        if profile_id:
+        if self.profile_id:
             return queryset.filter(
-                Q(passenger_user_id=user_id) | Q(profile_id=profile_id)
+                Q(passenger_user_id=self.user_id_str) | Q(profile_id=self.profile_id)
             )
         else:
-            return queryset.filter(passenger_user_id=user_id)
+            return queryset.filter(passenger_user_id=self.user_id_str)
     
     def perform_create(self, serializer):
-        user_id = str(self.request.user.id)
-        profile_id = self.request.headers.get('X-Profile-ID')
         serializer.save(
-            passenger_user_id=user_id,
-            profile_id=profile_id or 'customer',
-            created_by_id=user_id
+            passenger_user_id=self.user_id_str,
+            profile_id=self.profile_id or 'customer',
+            created_by_id=self.user_id_str
         )
     
     @action(detail=True, methods=['post'])
@@ -272,7 +406,7 @@ class TransportationBookingViewSet(viewsets.ModelViewSet):
         
         booking.status = 'confirmed'
         booking.confirmation_date = timezone.now()
-        booking.save()
+        booking.save(update_fields=['status', 'confirmation_date', 'updated_at'])
         
         serializer = self.get_serializer(booking)
         return Response(serializer.data)
@@ -289,13 +423,13 @@ class TransportationBookingViewSet(viewsets.ModelViewSet):
         
         booking.status = 'cancelled'
         booking.cancellation_date = timezone.now()
-        booking.save()
+        booking.save(update_fields=['status', 'cancellation_date', 'updated_at'])
         
         serializer = self.get_serializer(booking)
         return Response(serializer.data)
 
 
-class TransportationReviewViewSet(viewsets.ModelViewSet):
+class TransportationReviewViewSet(ProfileContextMixin, FilterBackendCacheMixin, viewsets.ModelViewSet):
     """ViewSet for transportation reviews"""
     
     serializer_class = TransportationReviewSerializer
@@ -304,24 +438,23 @@ class TransportationReviewViewSet(viewsets.ModelViewSet):
     ordering = ['-created_at']
     
     def get_queryset(self):
-        user_id = str(self.request.user.id)
-        profile_id = self.request.headers.get('X-Profile-ID')
-        
         queryset = TransportationReview.objects.select_related('provider', 'booking')
         
-        if profile_id:
+        if self.profile_id:
             return queryset.filter(
-                Q(reviewer_user_id=user_id) | Q(profile_id=profile_id)
+                Q(reviewer_user_id=self.user_id_str) | Q(profile_id=self.profile_id)
             )
         else:
-            return queryset.filter(reviewer_user_id=user_id)
+            return queryset.filter(reviewer_user_id=self.user_id_str)
     
     def perform_create(self, serializer):
-        user_id = str(self.request.user.id)
-        profile_id = self.request.headers.get('X-Profile-ID')
+        user = self.request.user
+        # Read the name fields directly: the stateless JWT TokenUser exposes
+        # claims as attributes but has no get_full_name()
+        full_name = ' '.join(filter(None, [user.first_name, user.last_name]))
         serializer.save(
-            reviewer_user_id=user_id,
-            reviewer_name=self.request.user.get_full_name() or self.request.user.email,
-            profile_id=profile_id or 'customer',
-            created_by_id=user_id
+            reviewer_user_id=self.user_id_str,
+            reviewer_name=full_name or user.email,
+            profile_id=self.profile_id or 'customer',
+            created_by_id=self.user_id_str
         )